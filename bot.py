@@ -1,563 +1,769 @@
-import os
-import asyncio
-import logging
-import json
-from aiohttp import web
-from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-
-from config import BOT_TOKEN
-from downloader import detect_platform, download_video, cleanup_file, extract_url, set_user_cookies
-
-# Setup logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
-logger = logging.getLogger(__name__)
-
-# Get port from environment (Koyeb sets this)
-PORT = int(os.environ.get('PORT', 8000))
-
-# Bot password - users must login with this password
-BOT_PASSWORD = "5123"
-
-# Directory for user cookies and authenticated users
-COOKIES_DIR = "user_cookies"
-AUTH_FILE = "authenticated_users.json"
-os.makedirs(COOKIES_DIR, exist_ok=True)
-
-# Platform emojis
-PLATFORM_EMOJI = {
-    'youtube': '🔴 YouTube',
-    'tiktok': '🎵 TikTok',
-    'instagram': '📸 Instagram',
-}
-
-# Load authenticated users
-def load_authenticated_users() -> set:
-    """Load list of authenticated user IDs."""
-    try:
-        if os.path.exists(AUTH_FILE):
-            with open(AUTH_FILE, 'r') as f:
-                return set(json.load(f))
-    except:
-        pass
-    return set()
-
-def save_authenticated_users(users: set):
-    """Save authenticated user IDs."""
-    with open(AUTH_FILE, 'w') as f:
-        json.dump(list(users), f)
-
-# Global set of authenticated users
-authenticated_users = load_authenticated_users()
-
-def is_authenticated(user_id: int) -> bool:
-    """Check if user is authenticated."""
-    return user_id in authenticated_users
-
-def authenticate_user(user_id: int):
-    """Add user to authenticated list."""
-    authenticated_users.add(user_id)
-    save_authenticated_users(authenticated_users)
-
-
-def get_user_cookies_path(user_id: int) -> str:
-    """Get the cookies file path for a user."""
-    return os.path.join(COOKIES_DIR, f"{user_id}_cookies.txt")
-
-
-def has_user_cookies(user_id: int) -> bool:
-    """Check if user has saved cookies."""
-    return os.path.exists(get_user_cookies_path(user_id))
-
-
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /start command."""
-    user_id = update.effective_user.id
-    
-    # Check if user is authenticated
-    if not is_authenticated(user_id):
-        await update.message.reply_text(
-            "🔒 **هذا البوت محمي بكلمة سر**\n\n"
-            "للاستخدام، أرسل كلمة السر مباشرة 👇",
-            parse_mode='Markdown'
-        )
-        return
-    
-    has_cookies = has_user_cookies(user_id)
-    cookies_status = "✅ لديك Cookies محفوظة" if has_cookies else "❌ لم تضف Cookies بعد"
-    
-    welcome_message = f"""
-🎬 **مرحباً بك في بوت تحميل الفيديوهات!**
-
-✅ أنت مسجل دخول
-
-أرسل لي رابط فيديو من:
-• 🎵 TikTok ✅
-• 📸 Instagram ✅
-• 🔴 YouTube (يحتاج Cookies)
-
-**حالة YouTube:** {cookies_status}
-
-**الأوامر:**
-/setcookies - إضافة YouTube Cookies
-/mycookies - حالة الـ Cookies
-/deletecookies - حذف الـ Cookies
-/help - المساعدة
-/logout - تسجيل الخروج
-
-⚠️ الحد الأقصى لحجم الفيديو 50MB
-"""
-    await update.message.reply_text(welcome_message, parse_mode='Markdown')
-
-
-async def login_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /login command."""
-    user_id = update.effective_user.id
-    
-    # Check if already logged in
-    if is_authenticated(user_id):
-        await update.message.reply_text("✅ أنت مسجل دخول بالفعل!")
-        return
-    
-    # Check password
-    if not context.args:
-        await update.message.reply_text(
-            "❌ أدخل كلمة السر:\n"
-            "`/login كلمة_السر`",
-            parse_mode='Markdown'
-        )
-        return
-    
-    password = context.args[0]
-    
-    if password == BOT_PASSWORD:
-        authenticate_user(user_id)
-        await update.message.reply_text(
-            "✅ **تم تسجيل الدخول بنجاح!**\n\n"
-            "يمكنك الآن استخدام البوت.\n"
-            "أرسل /start للبدء.",
-            parse_mode='Markdown'
-        )
-    else:
-        await update.message.reply_text("❌ كلمة السر غير صحيحة!")
-
-
-async def logout_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /logout command."""
-    user_id = update.effective_user.id
-    
-    if user_id in authenticated_users:
-        authenticated_users.remove(user_id)
-        save_authenticated_users(authenticated_users)
-        await update.message.reply_text("👋 تم تسجيل الخروج. إلى اللقاء!")
-    else:
-        await update.message.reply_text("❌ أنت غير مسجل دخول.")
-
-
-
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /help command."""
-    help_text = """
-📖 **كيفية الاستخدام:**
-
-1️⃣ انسخ رابط الفيديو
-2️⃣ الصقه هنا وأرسله
-3️⃣ استنى ثواني وهيوصلك الفيديو
-
-**المنصات المدعومة:**
-• ✅ TikTok - يعمل مباشرة
-• ✅ Instagram - يعمل مباشرة
-• ⚠️ YouTube - يحتاج Cookies
-
-**لتفعيل YouTube:**
-استخدم أمر /setcookies واتبع التعليمات
-
-**الأوامر:**
-/start - رسالة الترحيب
-/help - المساعدة
-/setcookies - إضافة Cookies
-/mycookies - حالة الـ Cookies
-/deletecookies - حذف الـ Cookies
-"""
-    await update.message.reply_text(help_text, parse_mode='Markdown')
-
-
-async def setcookies_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /setcookies command - explain how to add cookies."""
-    instructions = """
-🍪 **كيفية إضافة YouTube Cookies:**
-
-━━━━━━━━━━━━━━━━━━━━
-💻 **من الكمبيوتر (Chrome):**
-
-1️⃣ ثبت إضافة [Get cookies.txt LOCALLY](https://chromewebstore.google.com/detail/get-cookiestxt-locally/cclelndahbckbenkjhflpdbgdldlbecc)
-2️⃣ افتح YouTube وسجل دخول
-3️⃣ اضغط على الإضافة واضغط على زر Copy
-4️⃣ الصق المحتوى وارسله هنا
-
-━━━━━━━━━━━━━━━━━━━━
-📱 **من الموبايل (Android):**
-
-1️⃣ حمّل [Lemur Browser](https://play.google.com/store/apps/details?id=com.lemurbrowser.exts) من Play Store
-2️⃣ افتح المتصفح واضغط على أيقونة الإضافات (شكل شباك) في الأسفل → اضغط Chrome → حمّل إضافة [Get cookies.txt LOCALLY](https://chromewebstore.google.com/detail/get-cookiestxt-locally/cclelndahbckbenkjhflpdbgdldlbecc)
-3️⃣ افتح YouTube وسجل دخول
-4️⃣ اضغط على الإضافة واضغط على زر Copy
-5️⃣ الصق المحتوى وارسله هنا
-
-━━━━━━━━━━━━━━━━━━━━
-⚠️ **ملاحظات مهمة:**
-• استخدم حساب Google **ثانوي** (ليس الأساسي)
-• الـ Cookies تنتهي صلاحيتها بعد فترة
-• لا تشارك الـ Cookies مع أي شخص
-
-📤 **الآن ارسل محتوى الـ Cookies:**
-"""
-    await update.message.reply_text(instructions, parse_mode='Markdown', disable_web_page_preview=True)
-    
-    # Set state to expect cookies
-    context.user_data['awaiting_cookies'] = True
-
-
-async def mycookies_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /mycookies command - check cookies status."""
-    user_id = update.effective_user.id
-    cookies_path = get_user_cookies_path(user_id)
-    
-    if os.path.exists(cookies_path):
-        file_size = os.path.getsize(cookies_path)
-        mod_time = os.path.getmtime(cookies_path)
-        from datetime import datetime
-        mod_date = datetime.fromtimestamp(mod_time).strftime('%Y-%m-%d %H:%M')
-        
-        await update.message.reply_text(
-            f"✅ **لديك Cookies محفوظة**\n\n"
-            f"📁 الحجم: {file_size} bytes\n"
-            f"📅 آخر تحديث: {mod_date}\n\n"
-            f"YouTube يجب أن يعمل معك! 🎉",
-            parse_mode='Markdown'
-        )
-    else:
-        await update.message.reply_text(
-            "❌ **لم تضف Cookies بعد**\n\n"
-            "استخدم /setcookies لإضافة Cookies وتفعيل YouTube",
-            parse_mode='Markdown'
-        )
-
-
-async def deletecookies_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /deletecookies command - delete user's cookies."""
-    user_id = update.effective_user.id
-    cookies_path = get_user_cookies_path(user_id)
-    
-    if os.path.exists(cookies_path):
-        os.remove(cookies_path)
-        await update.message.reply_text("✅ تم حذف الـ Cookies بنجاح")
-    else:
-        await update.message.reply_text("❌ لا توجد Cookies محفوظة لحذفها")
-
-
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle incoming messages."""
-    text = update.message.text
-    user_id = update.effective_user.id
-    
-    # Check if user is trying to login with password directly
-    if not is_authenticated(user_id):
-        # Check if the message is the password
-        if text.strip() == BOT_PASSWORD:
-            authenticate_user(user_id)
-            await update.message.reply_text(
-                "✅ **تم تسجيل الدخول بنجاح!**\n\n"
-                "يمكنك الآن استخدام البوت.\n"
-                "أرسل رابط فيديو للتحميل!",
-                parse_mode='Markdown'
-            )
-            return
-        else:
-            await update.message.reply_text(
-                "🔒 **كلمة السر غير صحيحة**\n\n"
-                "أرسل كلمة السر الصحيحة للدخول."
-            )
-            return
-    
-    # Check if user is sending cookies
-    if context.user_data.get('awaiting_cookies'):
-        context.user_data['awaiting_cookies'] = False
-        
-        # Validate cookies format (should start with # or contain cookie lines)
-        if '# Netscape HTTP Cookie File' in text or '\t' in text:
-            # Clean and fix cookies format
-            lines = text.strip().split('\n')
-            fixed_lines = []
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                # Skip comment lines
-                if line.startswith('#'):
-                    fixed_lines.append(line)
-                    continue
-                
-                # Fix tabs - Telegram might convert them to spaces
-                # Cookie lines should have 6 or 7 tab-separated fields
-                parts = line.split()
-                if len(parts) >= 6:
-                    # Reconstruct with proper tabs
-                    # Format: domain, flag, path, secure, expiry, name, value
-                    if len(parts) == 7:
-                        fixed_line = '\t'.join(parts)
-                    elif len(parts) > 7:
-                        # Value might contain spaces, join the rest
-                        fixed_line = '\t'.join(parts[:6]) + '\t' + ' '.join(parts[6:])
-                    else:
-                        fixed_line = '\t'.join(parts)
-                    fixed_lines.append(fixed_line)
-                else:
-                    fixed_lines.append(line)
-            
-            # Ensure header exists
-            if not any('# Netscape HTTP Cookie File' in l for l in fixed_lines):
-                fixed_lines.insert(0, '# Netscape HTTP Cookie File')
-                fixed_lines.insert(1, '# This is a generated file!')
-            
-            # Save cookies
-            cookies_content = '\n'.join(fixed_lines)
-            cookies_path = get_user_cookies_path(user_id)
-            with open(cookies_path, 'w', encoding='utf-8', newline='\n') as f:
-                f.write(cookies_content)
-            
-            # Verify saved file
-            saved_size = os.path.getsize(cookies_path)
-            
-            await update.message.reply_text(
-                f"✅ **تم حفظ الـ Cookies بنجاح!**\n\n"
-                f"📁 حجم الملف: {saved_size} bytes\n"
-                f"📝 عدد السطور: {len(fixed_lines)}\n\n"
-                "الآن يمكنك تحميل فيديوهات YouTube 🎉\n\n"
-                "جرب ارسل رابط YouTube!",
-                parse_mode='Markdown'
-            )
-            return
-        else:
-            await update.message.reply_text(
-                "❌ **صيغة Cookies غير صحيحة**\n\n"
-                "تأكد من نسخ كل محتوى ملف cookies.txt\n"
-                "يجب أن يبدأ بـ: `# Netscape HTTP Cookie File`\n\n"
-                "استخدم /setcookies للمحاولة مرة أخرى",
-                parse_mode='Markdown'
-            )
-            return
-    
-    # Extract URL from message
-    url = extract_url(text)
-    
-    if not url:
-        await update.message.reply_text("❌ مفيش رابط في الرسالة. ابعت رابط فيديو صحيح.")
-        return
-    
-    # Detect platform
-    platform = detect_platform(url)
-    
-    if not platform:
-        await update.message.reply_text(
-            "❌ الرابط ده مش مدعوم.\n"
-            "المنصات المدعومة: YouTube, TikTok, Instagram"
-        )
-        return
-    
-    platform_name = PLATFORM_EMOJI.get(platform, platform)
-    
-    # Check for YouTube without cookies (User or Default)
-    cookies_to_use = None
-    user_cookies_path = get_user_cookies_path(user_id)
-    
-    if os.path.exists(user_cookies_path):
-        cookies_to_use = user_cookies_path
-    elif os.path.exists('default_cookies.txt'):
-         cookies_to_use = 'default_cookies.txt'
-         
-    if platform == 'youtube' and not cookies_to_use:
-        await update.message.reply_text(
-            "⚠️ **YouTube يحتاج Cookies**\n\n"
-            "لتحميل فيديوهات YouTube، تحتاج إضافة Cookies.\n\n"
-            "استخدم /setcookies واتبع التعليمات.",
-            parse_mode='Markdown'
-        )
-        return
-    
-    # Send processing message
-    processing_msg = await update.message.reply_text(
-        f"⏳ جاري تحميل الفيديو من {platform_name}...\n"
-        "ممكن ياخد شوية وقت حسب حجم الفيديو 🎬"
-    )
-    
-    try:
-        # Get cookies path (User > Default > None)
-        user_cookies = cookies_to_use
-        
-        # Download video
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, download_video, url, user_cookies)
-        
-        if not result:
-            await processing_msg.edit_text("❌ فشل تحميل الفيديو. جرب تاني.")
-            return
-        
-        if 'error' in result:
-            await processing_msg.edit_text(f"❌ {result['error']}")
-            return
-        
-        # Prepare caption - escape special Markdown characters
-        title = result.get('title', 'No Title')
-        description = result.get('description', '')
-        uploader = result.get('uploader', '')
-        
-        # Escape Markdown special characters
-        def escape_markdown(text):
-            if not text:
-                return text
-            special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-            for char in special_chars:
-                text = text.replace(char, '\\' + char)
-            return text
-        
-        safe_title = escape_markdown(title)
-        safe_uploader = escape_markdown(uploader)
-        safe_description = escape_markdown(description)
-        
-        caption = f"🎬 *{safe_title}*\n\n"
-        if safe_uploader:
-            caption += f"👤 {safe_uploader}\n\n"
-        if safe_description and safe_description != 'No Description':
-            max_desc_len = 700 - len(caption)
-            if len(safe_description) > max_desc_len:
-                safe_description = safe_description[:max_desc_len] + "..."
-            caption += f"📝 {safe_description}\n\n"
-        caption += "📥 تم التحميل بواسطة @AHBOTDON_bot"
-        
-        # Update processing message
-        await processing_msg.edit_text("📤 جاري إرسال الفيديو...")
-        
-        # Send video
-        file_path = result.get('file_path')
-        if file_path:
-            try:
-                with open(file_path, 'rb') as video_file:
-                    await update.message.reply_video(
-                        video=video_file,
-                        caption=caption[:1024],
-                        parse_mode='Markdown',
-                        supports_streaming=True
-                    )
-            except Exception as send_error:
-                # If Markdown fails, try without parse_mode
-                logger.warning(f"Markdown failed, sending without: {send_error}")
-                with open(file_path, 'rb') as video_file:
-                    plain_caption = f"🎬 {title}\n\n"
-                    if uploader:
-                        plain_caption += f"👤 {uploader}\n\n"
-                    plain_caption += "📥 تم التحميل بواسطة @AHBOTDON_bot"
-                    await update.message.reply_video(
-                        video=video_file,
-                        caption=plain_caption[:1024],
-                        supports_streaming=True
-                    )
-            
-            cleanup_file(file_path)
-        
-        await processing_msg.delete()
-        
-    except Exception as e:
-        logger.error(f"Error processing video: {e}")
-        await processing_msg.edit_text(
-            "❌ حصل خطأ أثناء التحميل.\n"
-            "تأكد إن الرابط صحيح وجرب تاني."
-        )
-
-
-async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle errors."""
-    logger.error(f"Update {update} caused error {context.error}")
-
-
-# Health check endpoint for Koyeb
-async def health_check(request):
-    return web.Response(text="OK")
-
-
-async def main():
-    """Start the bot with webhook."""
-    application = Application.builder().token(BOT_TOKEN).build()
-    
-    # Add handlers
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("login", login_command))
-    application.add_handler(CommandHandler("logout", logout_command))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("setcookies", setcookies_command))
-    application.add_handler(CommandHandler("mycookies", mycookies_command))
-    application.add_handler(CommandHandler("deletecookies", deletecookies_command))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-    
-    application.add_error_handler(error_handler)
-    
-    await application.initialize()
-    await application.start()
-    
-    # Web server setup
-    app = web.Application()
-    app.router.add_get('/', health_check)
-    app.router.add_get('/health', health_check)
-    
-    async def telegram_webhook(request):
-        try:
-            data = await request.json()
-            update = Update.de_json(data, application.bot)
-            await application.process_update(update)
-            return web.Response(text="OK")
-        except Exception as e:
-            logger.error(f"Error processing update: {e}")
-            return web.Response(text="Error", status=500)
-    
-    app.router.add_post('/webhook', telegram_webhook)
-    
-    webhook_url = os.environ.get('KOYEB_PUBLIC_DOMAIN', '')
-    
-    if webhook_url:
-        full_webhook_url = f"https://{webhook_url}/webhook"
-        await application.bot.set_webhook(url=full_webhook_url)
-        logger.info(f"Webhook set to: {full_webhook_url}")
-    else:
-        logger.info("No KOYEB_PUBLIC_DOMAIN found, starting in polling mode...")
-        await application.stop()
-        application2 = Application.builder().token(BOT_TOKEN).build()
-        application2.add_handler(CommandHandler("start", start))
-        application2.add_handler(CommandHandler("login", login_command))
-        application2.add_handler(CommandHandler("logout", logout_command))
-        application2.add_handler(CommandHandler("help", help_command))
-        application2.add_handler(CommandHandler("setcookies", setcookies_command))
-        application2.add_handler(CommandHandler("mycookies", mycookies_command))
-        application2.add_handler(CommandHandler("deletecookies", deletecookies_command))
-        application2.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-        application2.add_error_handler(error_handler)
-        application2.run_polling(allowed_updates=Update.ALL_TYPES)
-        return
-    
-    runner = web.AppRunner(app)
-    await runner.setup()
-    site = web.TCPSite(runner, '0.0.0.0', PORT)
-    await site.start()
-    
-    logger.info(f"Bot started on port {PORT}!")
-    
-    while True:
-        await asyncio.sleep(3600)
-
-
-if __name__ == "__main__":
-    asyncio.run(main())
+import os
+import asyncio
+import logging
+import json
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+
+from config import BOT_TOKEN, DISK_IO_WORKERS, LOOP_LAG_INTERVAL, LOOP_LAG_WARN_MS, YTDLP_ISOLATION, ADMIN_USER_IDS, PROFILE_MAX_SECONDS
+from urls import normalize_url, extract_url
+from outbound import dispatcher, PRIORITY_MEDIA, PRIORITY_NORMAL, PRIORITY_STATUS
+from workers import get_ytdlp_pool
+from tracing import trace, span, get_trace_id, profile_stacks
+from downloader import download_video, cleanup_file, set_user_cookies, read_file_bytes
+
+# Setup logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Get port from environment (Koyeb sets this)
+PORT = int(os.environ.get('PORT', 8000))
+
+# Bot password - users must login with this password
+BOT_PASSWORD = "5123"
+
+# Directory for user cookies and authenticated users
+COOKIES_DIR = "user_cookies"
+AUTH_FILE = "authenticated_users.json"
+os.makedirs(COOKIES_DIR, exist_ok=True)
+
+# Platform emojis
+PLATFORM_EMOJI = {
+    'youtube': '🔴 YouTube',
+    'tiktok': '🎵 TikTok',
+    'instagram': '📸 Instagram',
+}
+
+# Load authenticated users
+def load_authenticated_users() -> set:
+    """Load list of authenticated user IDs."""
+    try:
+        if os.path.exists(AUTH_FILE):
+            with open(AUTH_FILE, 'r') as f:
+                return set(json.load(f))
+    except:
+        pass
+    return set()
+
+def save_authenticated_users(users: set):
+    """Save authenticated user IDs."""
+    with open(AUTH_FILE, 'w') as f:
+        json.dump(list(users), f)
+
+# Global set of authenticated users
+authenticated_users = load_authenticated_users()
+
+def is_authenticated(user_id: int) -> bool:
+    """Check if user is authenticated."""
+    return user_id in authenticated_users
+
+def authenticate_user(user_id: int):
+    """Add user to authenticated list."""
+    authenticated_users.add(user_id)
+    save_authenticated_users(authenticated_users)
+
+
+def get_user_cookies_path(user_id: int) -> str:
+    """Get the cookies file path for a user."""
+    return os.path.join(COOKIES_DIR, f"{user_id}_cookies.txt")
+
+
+def has_user_cookies(user_id: int) -> bool:
+    """Check if user has saved cookies."""
+    return os.path.exists(get_user_cookies_path(user_id))
+
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /start command."""
+    user_id = update.effective_user.id
+    
+    # Check if user is authenticated
+    if not is_authenticated(user_id):
+        await update.message.reply_text(
+            "🔒 **هذا البوت محمي بكلمة سر**\n\n"
+            "للاستخدام، أرسل كلمة السر مباشرة 👇",
+            parse_mode='Markdown'
+        )
+        return
+    
+    has_cookies = has_user_cookies(user_id)
+    cookies_status = "✅ لديك Cookies محفوظة" if has_cookies else "❌ لم تضف Cookies بعد"
+    
+    welcome_message = f"""
+🎬 **مرحباً بك في بوت تحميل الفيديوهات!**
+
+✅ أنت مسجل دخول
+
+أرسل لي رابط فيديو من:
+• 🎵 TikTok ✅
+• 📸 Instagram ✅
+• 🔴 YouTube (يحتاج Cookies)
+
+**حالة YouTube:** {cookies_status}
+
+**الأوامر:**
+/audio - تحميل الصوت فقط
+/setcookies - إضافة YouTube Cookies
+/mycookies - حالة الـ Cookies
+/deletecookies - حذف الـ Cookies
+/help - المساعدة
+/logout - تسجيل الخروج
+
+⚠️ الحد الأقصى لحجم الفيديو 50MB
+"""
+    await update.message.reply_text(welcome_message, parse_mode='Markdown')
+
+
+async def login_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /login command."""
+    user_id = update.effective_user.id
+    
+    # Check if already logged in
+    if is_authenticated(user_id):
+        await update.message.reply_text("✅ أنت مسجل دخول بالفعل!")
+        return
+    
+    # Check password
+    if not context.args:
+        await update.message.reply_text(
+            "❌ أدخل كلمة السر:\n"
+            "`/login كلمة_السر`",
+            parse_mode='Markdown'
+        )
+        return
+    
+    password = context.args[0]
+    
+    if password == BOT_PASSWORD:
+        authenticate_user(user_id)
+        await update.message.reply_text(
+            "✅ **تم تسجيل الدخول بنجاح!**\n\n"
+            "يمكنك الآن استخدام البوت.\n"
+            "أرسل /start للبدء.",
+            parse_mode='Markdown'
+        )
+    else:
+        await update.message.reply_text("❌ كلمة السر غير صحيحة!")
+
+
+async def logout_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /logout command."""
+    user_id = update.effective_user.id
+    
+    if user_id in authenticated_users:
+        authenticated_users.remove(user_id)
+        save_authenticated_users(authenticated_users)
+        await update.message.reply_text("👋 تم تسجيل الخروج. إلى اللقاء!")
+    else:
+        await update.message.reply_text("❌ أنت غير مسجل دخول.")
+
+
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /help command."""
+    help_text = """
+📖 **كيفية الاستخدام:**
+
+1️⃣ انسخ رابط الفيديو
+2️⃣ الصقه هنا وأرسله
+3️⃣ استنى ثواني وهيوصلك الفيديو
+
+**المنصات المدعومة:**
+• ✅ TikTok - يعمل مباشرة
+• ✅ Instagram - يعمل مباشرة
+• ⚠️ YouTube - يحتاج Cookies
+
+**لتفعيل YouTube:**
+استخدم أمر /setcookies واتبع التعليمات
+
+**الأوامر:**
+/start - رسالة الترحيب
+/help - المساعدة
+/audio - تحميل الصوت فقط
+/setcookies - إضافة Cookies
+/mycookies - حالة الـ Cookies
+/deletecookies - حذف الـ Cookies
+"""
+    await update.message.reply_text(help_text, parse_mode='Markdown')
+
+
+async def setcookies_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /setcookies command - explain how to add cookies."""
+    instructions = """
+🍪 **كيفية إضافة YouTube Cookies:**
+
+━━━━━━━━━━━━━━━━━━━━
+💻 **من الكمبيوتر (Chrome):**
+
+1️⃣ ثبت إضافة [Get cookies.txt LOCALLY](https://chromewebstore.google.com/detail/get-cookiestxt-locally/cclelndahbckbenkjhflpdbgdldlbecc)
+2️⃣ افتح YouTube وسجل دخول
+3️⃣ اضغط على الإضافة واضغط على زر Copy
+4️⃣ الصق المحتوى وارسله هنا
+
+━━━━━━━━━━━━━━━━━━━━
+📱 **من الموبايل (Android):**
+
+1️⃣ حمّل [Lemur Browser](https://play.google.com/store/apps/details?id=com.lemurbrowser.exts) من Play Store
+2️⃣ افتح المتصفح واضغط على أيقونة الإضافات (شكل شباك) في الأسفل → اضغط Chrome → حمّل إضافة [Get cookies.txt LOCALLY](https://chromewebstore.google.com/detail/get-cookiestxt-locally/cclelndahbckbenkjhflpdbgdldlbecc)
+3️⃣ افتح YouTube وسجل دخول
+4️⃣ اضغط على الإضافة واضغط على زر Copy
+5️⃣ الصق المحتوى وارسله هنا
+
+━━━━━━━━━━━━━━━━━━━━
+⚠️ **ملاحظات مهمة:**
+• استخدم حساب Google **ثانوي** (ليس الأساسي)
+• الـ Cookies تنتهي صلاحيتها بعد فترة
+• لا تشارك الـ Cookies مع أي شخص
+
+📤 **الآن ارسل محتوى الـ Cookies:**
+"""
+    await update.message.reply_text(instructions, parse_mode='Markdown', disable_web_page_preview=True)
+    
+    # Set state to expect cookies
+    context.user_data['awaiting_cookies'] = True
+
+
+async def mycookies_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /mycookies command - check cookies status."""
+    user_id = update.effective_user.id
+    cookies_path = get_user_cookies_path(user_id)
+    
+    if os.path.exists(cookies_path):
+        file_size = os.path.getsize(cookies_path)
+        mod_time = os.path.getmtime(cookies_path)
+        from datetime import datetime
+        mod_date = datetime.fromtimestamp(mod_time).strftime('%Y-%m-%d %H:%M')
+        
+        await update.message.reply_text(
+            f"✅ **لديك Cookies محفوظة**\n\n"
+            f"📁 الحجم: {file_size} bytes\n"
+            f"📅 آخر تحديث: {mod_date}\n\n"
+            f"YouTube يجب أن يعمل معك! 🎉",
+            parse_mode='Markdown'
+        )
+    else:
+        await update.message.reply_text(
+            "❌ **لم تضف Cookies بعد**\n\n"
+            "استخدم /setcookies لإضافة Cookies وتفعيل YouTube",
+            parse_mode='Markdown'
+        )
+
+
+async def deletecookies_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /deletecookies command - delete user's cookies."""
+    user_id = update.effective_user.id
+    cookies_path = get_user_cookies_path(user_id)
+    
+    if os.path.exists(cookies_path):
+        os.remove(cookies_path)
+        await update.message.reply_text("✅ تم حذف الـ Cookies بنجاح")
+    else:
+        await update.message.reply_text("❌ لا توجد Cookies محفوظة لحذفها")
+
+
+async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle incoming messages."""
+    text = update.message.text
+    user_id = update.effective_user.id
+    
+    # Check if user is trying to login with password directly
+    if not is_authenticated(user_id):
+        # Check if the message is the password
+        if text.strip() == BOT_PASSWORD:
+            authenticate_user(user_id)
+            await reply_text(
+                update,
+                "✅ **تم تسجيل الدخول بنجاح!**\n\n"
+                "يمكنك الآن استخدام البوت.\n"
+                "أرسل رابط فيديو للتحميل!",
+                parse_mode='Markdown'
+            )
+            return
+        else:
+            await reply_text(
+                update,
+                "🔒 **كلمة السر غير صحيحة**\n\n"
+                "أرسل كلمة السر الصحيحة للدخول."
+            )
+            return
+    
+    # Check if user is sending cookies
+    if context.user_data.get('awaiting_cookies'):
+        context.user_data['awaiting_cookies'] = False
+        
+        # Validate cookies format (should start with # or contain cookie lines)
+        if '# Netscape HTTP Cookie File' in text or '\t' in text:
+            # Clean and fix cookies format
+            lines = text.strip().split('\n')
+            fixed_lines = []
+            
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                    
+                # Skip comment lines
+                if line.startswith('#'):
+                    fixed_lines.append(line)
+                    continue
+                
+                # Fix tabs - Telegram might convert them to spaces
+                # Cookie lines should have 6 or 7 tab-separated fields
+                parts = line.split()
+                if len(parts) >= 6:
+                    # Reconstruct with proper tabs
+                    # Format: domain, flag, path, secure, expiry, name, value
+                    if len(parts) == 7:
+                        fixed_line = '\t'.join(parts)
+                    elif len(parts) > 7:
+                        # Value might contain spaces, join the rest
+                        fixed_line = '\t'.join(parts[:6]) + '\t' + ' '.join(parts[6:])
+                    else:
+                        fixed_line = '\t'.join(parts)
+                    fixed_lines.append(fixed_line)
+                else:
+                    fixed_lines.append(line)
+            
+            # Ensure header exists
+            if not any('# Netscape HTTP Cookie File' in l for l in fixed_lines):
+                fixed_lines.insert(0, '# Netscape HTTP Cookie File')
+                fixed_lines.insert(1, '# This is a generated file!')
+            
+            # Save cookies
+            cookies_content = '\n'.join(fixed_lines)
+            cookies_path = get_user_cookies_path(user_id)
+            with open(cookies_path, 'w', encoding='utf-8', newline='\n') as f:
+                f.write(cookies_content)
+            
+            # Verify saved file
+            saved_size = os.path.getsize(cookies_path)
+            
+            await reply_text(
+                update,
+                f"✅ **تم حفظ الـ Cookies بنجاح!**\n\n"
+                f"📁 حجم الملف: {saved_size} bytes\n"
+                f"📝 عدد السطور: {len(fixed_lines)}\n\n"
+                "الآن يمكنك تحميل فيديوهات YouTube 🎉\n\n"
+                "جرب ارسل رابط YouTube!",
+                parse_mode='Markdown'
+            )
+            return
+        else:
+            await reply_text(
+                update,
+                "❌ **صيغة Cookies غير صحيحة**\n\n"
+                "تأكد من نسخ كل محتوى ملف cookies.txt\n"
+                "يجب أن يبدأ بـ: `# Netscape HTTP Cookie File`\n\n"
+                "استخدم /setcookies للمحاولة مرة أخرى",
+                parse_mode='Markdown'
+            )
+            return
+    
+    await process_url(update, text)
+
+
+async def audio_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /audio command - download audio only."""
+    if not is_authenticated(update.effective_user.id):
+        await reply_text(update, "🔒 سجل دخول الأول - أرسل كلمة السر.")
+        return
+    
+    if not context.args:
+        await reply_text(
+            update,
+            "🎵 **تحميل الصوت فقط:**\n"
+            "`/audio رابط_الفيديو`",
+            parse_mode='Markdown'
+        )
+        return
+    
+    await process_url(update, ' '.join(context.args), audio_only=True)
+
+
+def reply_text(update: Update, text: str, **kwargs):
+    """Reply through the outbound dispatcher."""
+    return dispatcher.send(
+        update.effective_chat.id,
+        lambda: update.message.reply_text(text, **kwargs),
+    )
+
+
+def edit_status(message, text: str, priority: int = PRIORITY_STATUS):
+    """Edit a status message; newer edits of the same message replace queued ones.
+
+    Returns an awaitable future - no need to await it for cosmetic edits.
+    """
+    return dispatcher.submit(
+        message.chat_id,
+        lambda: message.edit_text(text),
+        priority,
+        merge_key=(message.chat_id, message.message_id),
+    )
+
+
+# File reads/deletes get their own small pool: the default executor is shared
+# with download_video, whose threads block for whole downloads.
+disk_executor = ThreadPoolExecutor(max_workers=DISK_IO_WORKERS, thread_name_prefix='disk')
+
+
+def run_disk_io(func, *args):
+    """Run blocking file I/O off the event loop on the disk pool."""
+    return asyncio.get_running_loop().run_in_executor(disk_executor, func, *args)
+
+
+async def process_url(update: Update, text: str, audio_only: bool = False):
+    """Download the media linked in text and send it back."""
+    with trace('process_url', user_id=update.effective_user.id, audio_only=audio_only):
+        await download_and_send(update, text, audio_only)
+
+
+async def download_and_send(update: Update, text: str, audio_only: bool):
+    """The actual work of process_url, run inside its trace."""
+    user_id = update.effective_user.id
+    chat_id = update.effective_chat.id
+    
+    # Extract URL from message
+    url = extract_url(text)
+    
+    if not url:
+        await reply_text(update, "❌ مفيش رابط في الرسالة. ابعت رابط فيديو صحيح.")
+        return
+    
+    # Canonicalize the link (resolves share links once, then cached)
+    with span('normalize_url', url=url) as attrs:
+        link = await normalize_url(url)
+        attrs['key'] = link and link['key']
+    
+    if not link:
+        await reply_text(
+            update,
+            "❌ الرابط ده مش مدعوم.\n"
+            "المنصات المدعومة: YouTube, TikTok, Instagram"
+        )
+        return
+    
+    url = link['url']
+    platform = link['platform']
+    platform_name = PLATFORM_EMOJI.get(platform, platform)
+    
+    # Check for YouTube without cookies (User or Default)
+    cookies_to_use = None
+    user_cookies_path = get_user_cookies_path(user_id)
+    
+    if os.path.exists(user_cookies_path):
+        cookies_to_use = user_cookies_path
+    elif os.path.exists('default_cookies.txt'):
+         cookies_to_use = 'default_cookies.txt'
+         
+    if platform == 'youtube' and not cookies_to_use:
+        await reply_text(
+            update,
+            "⚠️ **YouTube يحتاج Cookies**\n\n"
+            "لتحميل فيديوهات YouTube، تحتاج إضافة Cookies.\n\n"
+            "استخدم /setcookies واتبع التعليمات.",
+            parse_mode='Markdown'
+        )
+        return
+    
+    # Send processing message
+    media_name = "الصوت" if audio_only else "الفيديو"
+    processing_msg = await reply_text(
+        update,
+        f"⏳ جاري تحميل {media_name} من {platform_name}...\n"
+        f"ممكن ياخد شوية وقت حسب حجم {media_name} 🎬"
+    )
+    
+    result = None
+    try:
+        # Get cookies path (User > Default > None)
+        user_cookies = cookies_to_use
+        
+        # Download video (to_thread carries the trace context into the worker thread)
+        with span('download_video', platform=platform) as attrs:
+            result = await asyncio.to_thread(download_video, url, user_cookies, audio_only)
+            attrs['ok'] = bool(result and 'file_path' in result)
+        
+        if not result:
+            await edit_status(processing_msg, f"❌ فشل تحميل {media_name}. جرب تاني.", PRIORITY_NORMAL)
+            return
+        
+        if 'error' in result:
+            await edit_status(processing_msg, f"❌ {result['error']}", PRIORITY_NORMAL)
+            return
+        
+        # Prepare caption - escape special Markdown characters
+        title = result.get('title', 'No Title')
+        description = result.get('description', '')
+        uploader = result.get('uploader', '')
+        
+        # Escape Markdown special characters
+        def escape_markdown(text):
+            if not text:
+                return text
+            special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
+            for char in special_chars:
+                text = text.replace(char, '\\' + char)
+            return text
+        
+        safe_title = escape_markdown(title)
+        safe_uploader = escape_markdown(uploader)
+        safe_description = escape_markdown(description)
+        
+        icon = "🎵" if result.get('is_audio') else "🎬"
+        caption = f"{icon} *{safe_title}*\n\n"
+        if safe_uploader:
+            caption += f"👤 {safe_uploader}\n\n"
+        if safe_description and safe_description != 'No Description':
+            max_desc_len = 700 - len(caption)
+            if len(safe_description) > max_desc_len:
+                safe_description = safe_description[:max_desc_len] + "..."
+            caption += f"📝 {safe_description}\n\n"
+        caption += "📥 تم التحميل بواسطة @AHBOTDON_bot"
+        
+        # Update processing message (cosmetic - the dispatcher owns it, don't wait)
+        edit_status(processing_msg, f"📤 جاري إرسال {media_name}...")
+        
+        # Send media
+        file_path = result.get('file_path')
+        if file_path:
+            # Read the file in a worker thread - a blocking read here would
+            # stall every other chat's handlers on slow disks.
+            media_data = await run_disk_io(read_file_bytes, file_path)
+            thumbnail_path = result.get('thumbnail_path')
+            
+            if result.get('is_audio') and not file_path.endswith(('.m4a', '.mp3')):
+                # Telegram only plays MP3/M4A as audio - send opus/webm as a file on purpose
+                send_media = update.message.reply_document
+                media_attrs = {
+                    'document': media_data,
+                    'filename': os.path.basename(file_path),
+                }
+            elif result.get('is_audio'):
+                send_media = update.message.reply_audio
+                media_attrs = {
+                    'audio': media_data,
+                    'filename': os.path.basename(file_path),
+                    'title': title,
+                    'performer': uploader or None,
+                    'duration': result.get('duration'),
+                }
+            else:
+                # Precomputed attributes let Telegram start playback immediately
+                send_media = update.message.reply_video
+                media_attrs = {
+                    'video': media_data,
+                    'filename': os.path.basename(file_path),
+                    'duration': result.get('duration'),
+                    'width': result.get('width'),
+                    'height': result.get('height'),
+                    'supports_streaming': True,
+                }
+                if thumbnail_path:
+                    media_attrs['thumbnail'] = await run_disk_io(read_file_bytes, thumbnail_path)
+            
+            with span('upload', bytes=len(media_data), audio=bool(result.get('is_audio'))):
+                # Deliveries jump ahead of status edits and survive flood waits
+                try:
+                    await dispatcher.send(chat_id, lambda: send_media(
+                        caption=caption[:1024],
+                        parse_mode='Markdown',
+                        **media_attrs
+                    ), PRIORITY_MEDIA)
+                except Exception as send_error:
+                    # If Markdown fails, try without parse_mode
+                    logger.warning(f"Markdown failed, sending without: {send_error}")
+                    plain_caption = f"{icon} {title}\n\n"
+                    if uploader:
+                        plain_caption += f"👤 {uploader}\n\n"
+                    plain_caption += "📥 تم التحميل بواسطة @AHBOTDON_bot"
+                    await dispatcher.send(chat_id, lambda: send_media(
+                        caption=plain_caption[:1024],
+                        **media_attrs
+                    ), PRIORITY_MEDIA)
+        
+        # Normal priority: a status delete may be dropped under load, and a
+        # leftover "sending..." message next to the video looks broken
+        try:
+            await dispatcher.send(chat_id, processing_msg.delete, PRIORITY_NORMAL,
+                                  merge_key=(chat_id, processing_msg.message_id))
+        except Exception as e:
+            # The media is already delivered - don't turn this into an error reply
+            logger.warning(f"Could not delete processing message: {e}")
+        
+    except Exception as e:
+        logger.error(f"Error processing {'audio' if audio_only else 'video'} (trace {get_trace_id()}): {e}")
+        await edit_status(
+            processing_msg,
+            "❌ حصل خطأ أثناء التحميل.\n"
+            "تأكد إن الرابط صحيح وجرب تاني.\n"
+            f"🔎 {get_trace_id()}",
+            PRIORITY_NORMAL
+        )
+    finally:
+        # Delete the download and its thumbnail even when sending failed
+        if result:
+            await run_disk_io(cleanup_file, result.get('file_path'))
+            await run_disk_io(cleanup_file, result.get('thumbnail_path'))
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /profile command - admin only stack sampling profiler."""
+    if update.effective_user.id not in ADMIN_USER_IDS:
+        return
+    
+    try:
+        seconds = min(float(context.args[0]), PROFILE_MAX_SECONDS) if context.args else 30
+    except ValueError:
+        seconds = 0
+    if not seconds > 0:
+        await reply_text(update, f"`/profile ثواني` (1-{PROFILE_MAX_SECONDS})", parse_mode='Markdown')
+        return
+    
+    await reply_text(update, f"🔬 جاري تسجيل البروفايل لمدة {seconds:g} ثانية...")
+    report = await asyncio.to_thread(profile_stacks, seconds)
+    
+    lines = [f"🔬 Profile: {report['samples']} samples / {seconds:g}s", "", "Self (running):"]
+    lines += [f"{count:>5}  {label}" for label, count in report['self']]
+    lines += ["", "Total (on stack):"]
+    lines += [f"{count:>5}  {label}" for label, count in report['total']]
+    await reply_text(update, '\n'.join(lines)[:4096])
+
+
+async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle errors."""
+    logger.error(f"Update {update} caused error {context.error}")
+
+
+# Health check endpoint for Koyeb
+async def health_check(request):
+    return web.Response(text="OK")
+
+
+# ==================== Event Loop Lag Monitor ====================
+
+# How late the event loop wakes up from a timed sleep. Anything blocking the
+# loop (disk I/O, CPU work) shows up here as lag for every chat.
+loop_lag_stats = {
+    'samples': 0,
+    'last_ms': 0.0,
+    'avg_ms': 0.0,
+    'max_ms': 0.0,
+    'slow_samples': 0,
+}
+
+# Long-lived tasks started in main() - the loop only keeps weak references
+background_tasks = set()
+
+
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL):
+    """Sample event loop lag forever."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag_ms = max(0.0, loop.time() - started - interval) * 1000
+        
+        stats = loop_lag_stats
+        stats['samples'] += 1
+        stats['last_ms'] = round(lag_ms, 2)
+        # Exponential moving average so the metric tracks recent load
+        stats['avg_ms'] = round(stats['avg_ms'] * 0.9 + lag_ms * 0.1, 2)
+        stats['max_ms'] = max(stats['max_ms'], round(lag_ms, 2))
+        if lag_ms > LOOP_LAG_WARN_MS:
+            stats['slow_samples'] += 1
+            logger.warning(f"Event loop lagged {lag_ms:.0f}ms")
+
+
+async def metrics(request):
+    """Expose runtime metrics as JSON."""
+    return web.json_response({
+        'event_loop_lag': loop_lag_stats,
+        'outbound': dispatcher.stats,
+        'ytdlp_workers': get_ytdlp_pool().report() if YTDLP_ISOLATION else None,
+    })
+
+
+async def main():
+    """Start the bot with webhook."""
+    application = Application.builder().token(BOT_TOKEN).build()
+    
+    # Add handlers
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("login", login_command))
+    application.add_handler(CommandHandler("logout", logout_command))
+    application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("setcookies", setcookies_command))
+    application.add_handler(CommandHandler("mycookies", mycookies_command))
+    application.add_handler(CommandHandler("deletecookies", deletecookies_command))
+    application.add_handler(CommandHandler("audio", audio_command))
+    application.add_handler(CommandHandler("profile", profile_command))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    
+    application.add_error_handler(error_handler)
+    
+    await application.initialize()
+    await application.start()
+    
+    background_tasks.add(asyncio.create_task(monitor_loop_lag()))
+    
+    # Web server setup
+    app = web.Application()
+    app.router.add_get('/', health_check)
+    app.router.add_get('/health', health_check)
+    app.router.add_get('/metrics', metrics)
+    
+    async def telegram_webhook(request):
+        try:
+            data = await request.json()
+            update = Update.de_json(data, application.bot)
+            with trace('telegram_webhook', update_id=update.update_id):
+                await application.process_update(update)
+            return web.Response(text="OK")
+        except Exception as e:
+            logger.error(f"Error processing update: {e}")
+            return web.Response(text="Error", status=500)
+    
+    app.router.add_post('/webhook', telegram_webhook)
+    
+    webhook_url = os.environ.get('KOYEB_PUBLIC_DOMAIN', '')
+    
+    if webhook_url:
+        full_webhook_url = f"https://{webhook_url}/webhook"
+        await application.bot.set_webhook(url=full_webhook_url)
+        logger.info(f"Webhook set to: {full_webhook_url}")
+    else:
+        logger.info("No KOYEB_PUBLIC_DOMAIN found, starting in polling mode...")
+        await application.stop()
+        application2 = Application.builder().token(BOT_TOKEN).build()
+        application2.add_handler(CommandHandler("start", start))
+        application2.add_handler(CommandHandler("login", login_command))
+        application2.add_handler(CommandHandler("logout", logout_command))
+        application2.add_handler(CommandHandler("help", help_command))
+        application2.add_handler(CommandHandler("setcookies", setcookies_command))
+        application2.add_handler(CommandHandler("mycookies", mycookies_command))
+        application2.add_handler(CommandHandler("deletecookies", deletecookies_command))
+        application2.add_handler(CommandHandler("audio", audio_command))
+        application2.add_handler(CommandHandler("profile", profile_command))
+        application2.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+        application2.add_error_handler(error_handler)
+        application2.run_polling(allowed_updates=Update.ALL_TYPES)
+        return
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '0.0.0.0', PORT)
+    await site.start()
+    
+    logger.info(f"Bot started on port {PORT}!")
+    
+    while True:
+        await asyncio.sleep(3600)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
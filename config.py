@@ -1,13 +1,58 @@
-# Bot Configuration
-
-BOT_TOKEN = "8481703426:AAFavsF9WFhIiGWQqM5YdfC-3HJGr6I16cM"
-
-# Telegram limits
-MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB max for Telegram bots
-
-# Temp directory for downloads
-TEMP_DIR = "downloads"
-
-# Supported platforms
-SUPPORTED_PLATFORMS = ["youtube", "tiktok", "instagram"]
-
+# Bot Configuration
+
+BOT_TOKEN = "8481703426:AAFavsF9WFhIiGWQqM5YdfC-3HJGr6I16cM"
+
+# Telegram limits
+MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB max for Telegram bots
+
+# Disk I/O
+DOWNLOAD_CHUNK_SIZE = 256 * 1024  # network read / file write size for direct downloads
+DISK_IO_WORKERS = 4  # threads for file reads/deletes in the bot, separate from downloads
+
+# Event loop lag monitor
+LOOP_LAG_INTERVAL = 0.5  # seconds between samples
+LOOP_LAG_WARN_MS = 250  # log a warning when a single sample lags more than this
+
+# ffmpeg post-processing (faststart remux + thumbnail)
+FFMPEG_TIMEOUT = 120  # seconds
+THUMBNAIL_SIZE = 320  # Telegram max thumbnail side in px
+
+# Re-encode oversize videos to fit MAX_FILE_SIZE (only when no native format fits)
+ENABLE_COMPRESSION = True
+COMPRESS_MAX_WORKERS = 1  # ffmpeg encoders running at once
+COMPRESS_QUEUE_SIZE = 3  # jobs allowed to wait for a worker
+COMPRESS_THREADS = 2  # CPU threads per encoder
+COMPRESS_PRESET = "veryfast"
+COMPRESS_AUDIO_KBPS = 96
+COMPRESS_MIN_VIDEO_KBPS = 200  # below this the result isn't worth watching
+COMPRESS_TIMEOUT = 900  # seconds
+
+# Resolved share links (vm.tiktok.com, instagram.com/share/...)
+URL_CACHE_SIZE = 2048
+URL_CACHE_TTL = 6 * 60 * 60  # seconds
+
+# Outgoing Bot API rate limits (Telegram allows ~30 msg/s overall, ~1 msg/s per chat)
+OUTBOUND_GLOBAL_RATE = 25  # calls per second
+OUTBOUND_CHAT_RATE = 1  # calls per second per chat
+OUTBOUND_CHAT_BURST = 3
+OUTBOUND_STATUS_BACKLOG = 20  # drop status edits when this many calls are queued
+OUTBOUND_MAX_RETRIES = 3  # RetryAfter retries before giving up
+
+# Run yt-dlp in recycled child processes (steady memory, hung jobs get killed)
+YTDLP_ISOLATION = True
+YTDLP_WORKERS = 2
+YTDLP_MAX_JOBS_PER_WORKER = 10  # restart a worker after this many jobs
+YTDLP_MAX_WORKER_RSS_MB = 300  # ... or once its memory grows past this
+YTDLP_JOB_TIMEOUT = 600  # seconds before a job's worker is killed
+
+# Request tracing (JSON span logs) and the admin /profile command
+TRACE_ENABLED = True
+ADMIN_USER_IDS = []  # Telegram user IDs allowed to run /profile
+PROFILE_MAX_SECONDS = 120
+
+# Temp directory for downloads
+TEMP_DIR = "downloads"
+
+# Supported platforms
+SUPPORTED_PLATFORMS = ["youtube", "tiktok", "instagram"]
+
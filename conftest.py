@@ -0,0 +1 @@
+# Lets tests import the bot modules from the repo root
@@ -0,0 +1,216 @@
+import os
+import json
+import shutil
+import struct
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    FFMPEG_TIMEOUT, THUMBNAIL_SIZE, MAX_FILE_SIZE,
+    COMPRESS_MAX_WORKERS, COMPRESS_QUEUE_SIZE, COMPRESS_THREADS, COMPRESS_PRESET,
+    COMPRESS_AUDIO_KBPS, COMPRESS_MIN_VIDEO_KBPS, COMPRESS_TIMEOUT,
+)
+from tracing import span
+
+
+# ==================== ffmpeg / ffprobe helpers ====================
+
+def has_ffmpeg() -> bool:
+    """Check if ffmpeg and ffprobe are installed."""
+    return bool(shutil.which('ffmpeg') and shutil.which('ffprobe'))
+
+
+def run_ffmpeg(args: list, timeout: int = FFMPEG_TIMEOUT, low_priority: bool = False) -> bool:
+    """Run ffmpeg quietly, return True on success."""
+    # Re-encodes run niced so the bot itself stays responsive
+    preexec_fn = (lambda: os.nice(10)) if low_priority and hasattr(os, 'nice') else None
+    try:
+        subprocess.run(
+            ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', *args],
+            check=True, timeout=timeout, preexec_fn=preexec_fn,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"ffmpeg error: {e.stderr.decode(errors='ignore')[:300]}")
+    except Exception as e:
+        print(f"ffmpeg error: {e}")
+    return False
+
+
+def probe_video(file_path: str) -> dict:
+    """Get duration, width and height using ffprobe."""
+    try:
+        output = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+             '-show_entries', 'stream=width,height:format=duration',
+             '-of', 'json', file_path],
+            check=True, timeout=30, capture_output=True,
+        ).stdout
+        data = json.loads(output)
+        stream = (data.get('streams') or [{}])[0]
+        duration = float(data.get('format', {}).get('duration') or 0)
+        return {
+            'duration': round(duration) or None,
+            'width': stream.get('width'),
+            'height': stream.get('height'),
+        }
+    except Exception as e:
+        print(f"ffprobe error: {e}")
+    return {}
+
+
+# ==================== Faststart Remux ====================
+
+def needs_faststart(file_path: str) -> bool:
+    """Check if the moov atom comes after mdat (player must read the whole file first)."""
+    if not file_path.lower().endswith(('.mp4', '.m4v', '.mov')):
+        return False
+    try:
+        file_size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            offset = 0
+            while offset + 8 <= file_size:
+                f.seek(offset)
+                size, box_type = struct.unpack('>I4s', f.read(8))
+                if size == 1:
+                    size = struct.unpack('>Q', f.read(8))[0]
+                elif size == 0:
+                    size = file_size - offset
+                if box_type == b'moov':
+                    return False
+                if box_type == b'mdat':
+                    return True
+                if size < 8:
+                    break
+                offset += size
+    except Exception as e:
+        print(f"MP4 parse error: {e}")
+    return False
+
+
+def remux_faststart(file_path: str) -> bool:
+    """Move the moov atom to the front without re-encoding."""
+    temp_path = os.path.splitext(file_path)[0] + '.faststart.mp4'
+    if run_ffmpeg(['-i', file_path, '-map', '0', '-c', 'copy', '-movflags', '+faststart', temp_path]):
+        os.replace(temp_path, file_path)
+        return True
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    return False
+
+
+# ==================== Thumbnail ====================
+
+def make_thumbnail(file_path: str, duration: int | None = None) -> str | None:
+    """Extract a small JPEG frame for Telegram's video preview."""
+    thumb_path = os.path.splitext(file_path)[0] + '.jpg'
+    # Skip the first second - it's often black
+    seek = min(1.0, duration / 2) if duration else 0
+    # Telegram wants at most 320px on the longest side
+    scale = (f"scale='if(gt(iw,ih),{THUMBNAIL_SIZE},-2)':"
+             f"'if(gt(iw,ih),-2,{THUMBNAIL_SIZE})'")
+    if run_ffmpeg(['-ss', str(seek), '-i', file_path, '-frames:v', '1',
+                   '-vf', scale, '-q:v', '5', thumb_path]):
+        if os.path.exists(thumb_path):
+            return thumb_path
+    return None
+
+
+# ==================== Budgeted Re-encode ====================
+
+# Re-encoding is CPU heavy: a small dedicated pool caps how many ffmpeg
+# encoders run at once, and the slots semaphore bounds the waiting queue.
+compress_executor = ThreadPoolExecutor(max_workers=COMPRESS_MAX_WORKERS, thread_name_prefix='compress')
+compress_slots = threading.BoundedSemaphore(COMPRESS_MAX_WORKERS + COMPRESS_QUEUE_SIZE)
+
+
+def compute_video_bitrate(duration: float, budget_bytes: int = MAX_FILE_SIZE) -> int | None:
+    """Video bitrate (kbps) that fits duration into the size budget, or None if too low."""
+    if not duration or duration <= 0:
+        return None
+    # Keep 5% headroom for the MP4 container and bitrate overshoot
+    total_kbps = budget_bytes * 8 * 0.95 / 1000 / duration
+    video_kbps = int(total_kbps - COMPRESS_AUDIO_KBPS)
+    if video_kbps < COMPRESS_MIN_VIDEO_KBPS:
+        return None
+    return video_kbps
+
+
+def encode_to_bitrate(file_path: str, output_path: str, video_kbps: int) -> bool:
+    """Re-encode to H.264/AAC at a fixed bitrate."""
+    args = [
+        '-i', file_path,
+        '-c:v', 'libx264', '-preset', COMPRESS_PRESET,
+        '-b:v', f'{video_kbps}k', '-maxrate', f'{video_kbps}k', '-bufsize', f'{video_kbps * 2}k',
+        '-threads', str(COMPRESS_THREADS),
+        '-c:a', 'aac', '-b:a', f'{COMPRESS_AUDIO_KBPS}k',
+        '-movflags', '+faststart',
+    ]
+    # Low bitrates look better at lower resolution
+    if video_kbps < 800:
+        args += ['-vf', "scale=-2:'min(480,ih)'"]
+    return run_ffmpeg([*args, output_path], timeout=COMPRESS_TIMEOUT, low_priority=True)
+
+
+def compress_video(file_path: str, duration: float | None = None) -> dict:
+    """Shrink an oversize video under MAX_FILE_SIZE.
+
+    Returns {'file_path': ...} for the new file or {'error': ...}. The input
+    file is left in place for the caller to clean up.
+    """
+    if not has_ffmpeg():
+        return {'error': 'الفيديو كبير جداً'}
+    
+    duration = duration or probe_video(file_path).get('duration')
+    video_kbps = compute_video_bitrate(duration)
+    if not video_kbps:
+        return {'error': 'الفيديو كبير جداً (طويل جداً للضغط)'}
+    
+    if not compress_slots.acquire(blocking=False):
+        return {'error': 'السيرفر مشغول بضغط فيديوهات تانية - جرب كمان شوية'}
+    
+    output_path = os.path.splitext(file_path)[0] + '.compressed.mp4'
+    try:
+        print(f"Compressing {file_path} → {video_kbps}kbps ({duration}s)")
+        ok = compress_executor.submit(encode_to_bitrate, file_path, output_path, video_kbps).result()
+    finally:
+        compress_slots.release()
+    
+    if ok and os.path.exists(output_path) and os.path.getsize(output_path) <= MAX_FILE_SIZE:
+        return {'file_path': output_path}
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    return {'error': 'الفيديو كبير جداً'}
+
+
+# ==================== Post-processing ====================
+
+def prepare_video(result: dict | None) -> dict | None:
+    """Make a downloaded video ready for instant playback in Telegram.
+
+    Remuxes to faststart when needed, fills in missing duration/width/height
+    and adds a thumbnail. Audio results and results without a file are
+    returned unchanged.
+    """
+    if not result or not result.get('file_path') or result.get('is_audio') or not has_ffmpeg():
+        return result
+
+    file_path = result['file_path']
+    try:
+        with span('postprocess') as attrs:
+            attrs['faststart'] = needs_faststart(file_path)
+            if attrs['faststart']:
+                print(f"Faststart remux: {file_path}")
+                remux_faststart(file_path)
+
+            if not (result.get('duration') and result.get('width') and result.get('height')):
+                probed = probe_video(file_path)
+                for key in ('duration', 'width', 'height'):
+                    if not result.get(key) and probed.get(key):
+                        result[key] = probed[key]
+
+            result['thumbnail_path'] = make_thumbnail(file_path, result.get('duration'))
+    except Exception as e:
+        print(f"Post-process error: {e}")
+    return result
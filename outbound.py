@@ -0,0 +1,216 @@
+import time
+import asyncio
+import itertools
+import logging
+from telegram.error import RetryAfter
+from config import (
+    OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST,
+    OUTBOUND_STATUS_BACKLOG, OUTBOUND_MAX_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes - lower number goes first
+PRIORITY_MEDIA = 0  # finished downloads
+PRIORITY_NORMAL = 1  # replies the user must see (errors, prompts)
+PRIORITY_STATUS = 2  # cosmetic progress edits / deletes - may be merged or dropped
+
+
+# ==================== Token Bucket ====================
+
+class TokenBucket:
+    """Classic token bucket with an optional flood-wait pause."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is ready now)."""
+        self.refill()
+        pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            return pause
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens (Telegram told us to wait)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def is_idle(self) -> bool:
+        self.refill()
+        return self.tokens >= self.capacity and self.paused_until <= time.monotonic()
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    """RetryAfter.retry_after is an int in PTB 20, a timedelta in newer versions."""
+    value = error.retry_after
+    return value.total_seconds() if hasattr(value, 'total_seconds') else float(value)
+
+
+# ==================== Dispatcher ====================
+
+class OutboundDispatcher:
+    """Single gateway for Bot API calls.
+
+    Calls are queued by priority and released through a global and a
+    per-chat token bucket. RetryAfter pauses the chat and re-queues the call.
+    Status calls sharing a merge_key replace each other, are dropped when the
+    backlog is long, and never raise - they are cosmetic.
+    """
+
+    def __init__(self):
+        self.queue = asyncio.PriorityQueue()
+        self.seq = itertools.count()
+        self.global_bucket = TokenBucket(OUTBOUND_GLOBAL_RATE, OUTBOUND_GLOBAL_RATE)
+        self.chat_buckets = {}
+        self.pending = {}  # merge_key -> queued job
+        self.worker = None
+        self.tasks = set()
+        self.stats = {'sent': 0, 'retried': 0, 'merged': 0, 'dropped': 0, 'failed': 0}
+
+    def chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if not bucket:
+            if len(self.chat_buckets) > 10000:
+                self.chat_buckets = {k: b for k, b in self.chat_buckets.items() if not b.is_idle()}
+            bucket = self.chat_buckets[chat_id] = TokenBucket(OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST)
+        return bucket
+
+    async def send(self, chat_id: int, call, priority: int = PRIORITY_NORMAL, merge_key=None):
+        """Queue call (a no-arg coroutine function) and return its result.
+
+        Returns None when a status call is merged away or dropped.
+        """
+        return await self.submit(chat_id, call, priority, merge_key)
+
+    def submit(self, chat_id: int, call, priority: int = PRIORITY_NORMAL, merge_key=None) -> asyncio.Future:
+        """Queue call and return a future for its result.
+
+        The dispatcher holds the job until it runs, so the future doesn't need
+        to be awaited (status calls never fail it).
+        """
+        if not self.worker or self.worker.done():
+            self.worker = asyncio.create_task(self.run())
+
+        job = {
+            'chat_id': chat_id,
+            'call': call,
+            'priority': priority,
+            'merge_key': merge_key,
+            'attempts': 0,
+            'future': asyncio.get_running_loop().create_future(),
+        }
+
+        if merge_key is not None:
+            old = self.pending.get(merge_key)
+            if old and not old['future'].done():
+                if old['priority'] < priority:
+                    # A more important call for the same message is queued
+                    self.stats['merged'] += 1
+                    job['future'].set_result(None)
+                    return job['future']
+                # The newer call replaces the queued one
+                old['future'].set_result(None)
+                self.stats['merged'] += 1
+            self.pending[merge_key] = job
+
+        if priority == PRIORITY_STATUS and (
+            self.queue.qsize() >= OUTBOUND_STATUS_BACKLOG or self.chat_bucket(chat_id).delay() > 5
+        ):
+            self.stats['dropped'] += 1
+            self.forget(job)
+            return job['future']
+
+        self.enqueue(job)
+        return job['future']
+
+    def enqueue(self, job: dict, delay: float = 0):
+        item = (job['priority'], next(self.seq), job)
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self.queue.put_nowait, item)
+        else:
+            self.queue.put_nowait(item)
+
+    def forget(self, job: dict):
+        if job['merge_key'] is not None and self.pending.get(job['merge_key']) is job:
+            del self.pending[job['merge_key']]
+        if not job['future'].done():
+            job['future'].set_result(None)
+
+    async def run(self):
+        """Release queued calls as tokens become available."""
+        while True:
+            _, _, job = await self.queue.get()
+            if job['future'].done():
+                continue  # merged away
+
+            # Global limit blocks everyone, so just wait for it
+            wait = self.global_bucket.delay()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                if job['future'].done():
+                    continue  # merged away while waiting
+
+            # A busy chat must not hold up the others - retry it later
+            chat_bucket = self.chat_bucket(job['chat_id'])
+            wait = chat_bucket.delay()
+            if wait > 0:
+                self.enqueue(job, wait)
+                continue
+
+            self.global_bucket.take()
+            chat_bucket.take()
+            if job['merge_key'] is not None and self.pending.get(job['merge_key']) is job:
+                del self.pending[job['merge_key']]
+            task = asyncio.create_task(self.execute(job))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def execute(self, job: dict):
+        future = job['future']
+        try:
+            result = await job['call']()
+        except RetryAfter as e:
+            seconds = retry_after_seconds(e)
+            self.chat_bucket(job['chat_id']).pause(seconds)
+            job['attempts'] += 1
+            if job['priority'] == PRIORITY_STATUS:
+                # Not worth waiting for a cosmetic edit
+                self.stats['dropped'] += 1
+                self.forget(job)
+            elif job['attempts'] > OUTBOUND_MAX_RETRIES:
+                self.stats['failed'] += 1
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                logger.warning(f"Flood wait {seconds}s for chat {job['chat_id']}, retrying")
+                self.stats['retried'] += 1
+                self.enqueue(job, seconds)
+        except Exception as e:
+            self.stats['failed'] += 1
+            if job['priority'] == PRIORITY_STATUS:
+                logger.warning(f"Status update failed: {e}")
+                self.forget(job)
+            elif not future.done():
+                future.set_exception(e)
+        else:
+            self.stats['sent'] += 1
+            if not future.done():
+                future.set_result(result)
+
+
+dispatcher = OutboundDispatcher()
@@ -0,0 +1,40 @@
+import pytest
+from urls import parse_url
+
+# input -> (platform, video_id, url, short)
+PARSE_URL_CASES = [
+    ('https://youtu.be/dQw4w9WgXcQ?si=abc',
+     ('youtube', 'dQw4w9WgXcQ', 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', False)),
+    ('https://m.youtube.com/shorts/dQw4w9WgXcQ',
+     ('youtube', 'dQw4w9WgXcQ', 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', False)),
+    ('https://www.instagram.com/reels/Cabc_12/?igsh=xyz',
+     ('instagram', 'Cabc_12', 'https://www.instagram.com/reel/Cabc_12/', False)),
+    ('https://www.instagram.com/reels/audio/1234567890/',
+     ('instagram', None, 'https://www.instagram.com/reels/audio/1234567890/', False)),
+    ('https://instagram.com/share/reel/Zz9/?igsh=xyz',
+     ('instagram', None, 'https://instagram.com/share/reel/Zz9/', True)),
+    ('https://www.instagram.com/share/p/Ab1/',
+     ('instagram', None, 'https://www.instagram.com/share/p/Ab1/', True)),
+    ('https://vm.tiktok.com/ZMabc123/?k=1',
+     ('tiktok', None, 'https://vm.tiktok.com/ZMabc123/', True)),
+    ('https://www.tiktok.com/t/ZTabc123/',
+     ('tiktok', None, 'https://www.tiktok.com/t/ZTabc123/', True)),
+    ('https://www.tiktok.com/@bob/video/7234567890123?is_from=1',
+     ('tiktok', '7234567890123', 'https://www.tiktok.com/@bob/video/7234567890123', False)),
+    ('https://www.tiktok.com/@bob/photo/7234567890123',
+     ('tiktok', '7234567890123', 'https://www.tiktok.com/@bob/photo/7234567890123', False)),
+    ('https://m.tiktok.com/v/7234567890123.html',
+     ('tiktok', '7234567890123', 'https://www.tiktok.com/@/video/7234567890123', False)),
+    ('https://notyoutube.com/watch?v=dQw4w9WgXcQ', None),
+]
+
+
+@pytest.mark.parametrize('url, expected', PARSE_URL_CASES)
+def test_parse_url(url, expected):
+    link = parse_url(url)
+    assert (link and (link['platform'], link['video_id'], link['url'], link['short'])) == expected
+
+
+def test_same_video_same_key():
+    assert parse_url('https://youtu.be/dQw4w9WgXcQ')['key'] == \
+        parse_url('https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=5')['key']
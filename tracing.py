@@ -0,0 +1,127 @@
+import sys
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from config import TRACE_ENABLED
+
+# JSON lines, one per finished span - grep a trace_id to see a whole request
+trace_logger = logging.getLogger('trace')
+trace_handler = logging.StreamHandler()
+trace_handler.setFormatter(logging.Formatter('%(message)s'))
+trace_logger.addHandler(trace_handler)
+trace_logger.setLevel(logging.INFO)
+trace_logger.propagate = False
+
+current_trace_id = contextvars.ContextVar('current_trace_id', default=None)
+current_span_id = contextvars.ContextVar('current_span_id', default=None)
+
+
+def new_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def get_trace_id() -> str | None:
+    return current_trace_id.get()
+
+
+# ==================== Spans ====================
+
+@contextmanager
+def span(name: str, **fields):
+    """Time a block and log it as a JSON span of the current trace.
+
+    Yields the fields dict so the block can attach more attributes. Context
+    variables follow asyncio tasks and asyncio.to_thread, so spans opened in
+    worker threads still land in the right trace.
+    """
+    if not TRACE_ENABLED:
+        yield fields
+        return
+
+    span_id = new_id()
+    parent_id = current_span_id.get()
+    token = current_span_id.set(span_id)
+    started = time.perf_counter()
+    status = 'ok'
+    try:
+        yield fields
+    except BaseException as e:
+        status = 'error'
+        fields['error'] = repr(e)[:200]
+        raise
+    finally:
+        current_span_id.reset(token)
+        trace_logger.info(json.dumps({
+            'ts': round(time.time(), 3),
+            'trace_id': current_trace_id.get(),
+            'span_id': span_id,
+            'parent_id': parent_id,
+            'span': name,
+            'ms': round((time.perf_counter() - started) * 1000, 1),
+            'status': status,
+            'thread': threading.current_thread().name,
+            **fields,
+        }, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def trace(name: str, **fields):
+    """Start a new trace (unless one is already active) with a root span."""
+    if current_trace_id.get():
+        with span(name, **fields) as attrs:
+            yield attrs
+        return
+
+    token = current_trace_id.set(new_id())
+    try:
+        with span(name, **fields) as attrs:
+            yield attrs
+    finally:
+        current_trace_id.reset(token)
+
+
+# ==================== Sampling Profiler ====================
+
+def profile_stacks(seconds: float, interval: float = 0.005, top: int = 15) -> dict:
+    """Sample every thread's stack for a while and count the hottest functions.
+
+    Blocking - run it in a worker thread. 'self' counts the frame that was
+    executing, 'total' counts every function on the stack (once per sample).
+    """
+    own_thread = threading.get_ident()
+    self_counts = Counter()
+    total_counts = Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            samples += 1
+            self_counts[frame_label(frame)] += 1
+            seen = set()
+            while frame is not None:
+                label = frame_label(frame)
+                if label not in seen:
+                    seen.add(label)
+                    total_counts[label] += 1
+                frame = frame.f_back
+        time.sleep(interval)
+
+    return {
+        'samples': samples,
+        'self': self_counts.most_common(top),
+        'total': total_counts.most_common(top),
+    }
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename.rsplit('/', 1)[-1]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
@@ -0,0 +1,175 @@
+import re
+import time
+import aiohttp
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+from config import URL_CACHE_SIZE, URL_CACHE_TTL
+
+
+# ==================== URL Extraction ====================
+
+URL_PATTERN = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+
+# Hosts per platform - subdomains (www., m., vm., ...) match too
+PLATFORM_DOMAINS = {
+    'youtube': ('youtube.com', 'youtu.be', 'youtube-nocookie.com'),
+    'tiktok': ('tiktok.com',),
+    'instagram': ('instagram.com', 'instagr.am'),
+}
+
+YOUTUBE_ID = re.compile(r'^[A-Za-z0-9_-]{11}$')
+TIKTOK_VIDEO_PATH = re.compile(r'^/(?:@([^/]+)/(video|photo)|v)/(\d+)')
+TIKTOK_SHORT_PATH = re.compile(r'^/(?:t/)?([A-Za-z0-9]+)/?$')
+INSTAGRAM_PATH = re.compile(r'^/(?:[^/]+/)?(p|reels?|tv)/([A-Za-z0-9_-]+)/?$')
+
+
+def extract_url(text: str) -> str | None:
+    """Extract URL from message text, preferring supported platforms."""
+    urls = [u.rstrip('.,;:!?)\'') for u in URL_PATTERN.findall(text)]
+    for url in urls:
+        if platform_for_host(urlsplit(url).hostname):
+            return url
+    return urls[0] if urls else None
+
+
+def platform_for_host(host: str | None) -> str | None:
+    """Map a hostname to its platform."""
+    host = (host or '').lower()
+    for platform, domains in PLATFORM_DOMAINS.items():
+        for domain in domains:
+            if host == domain or host.endswith('.' + domain):
+                return platform
+    return None
+
+
+# ==================== Canonical Parsing ====================
+
+def parse_url(url: str) -> dict | None:
+    """Parse a link into its canonical form without network access.
+
+    Returns {'platform', 'video_id', 'url', 'key', 'short'} or None for
+    unsupported links. 'short' is True when the link is a redirecting share
+    link that must be resolved to learn the video id.
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return None
+
+    host = (parts.hostname or '').lower()
+    platform = platform_for_host(host)
+    if not platform:
+        return None
+
+    path = parts.path or '/'
+    video_id = None
+    canonical = url
+    short = False
+
+    if platform == 'youtube':
+        segments = [s for s in path.split('/') if s]
+        if host == 'youtu.be' and segments:
+            video_id = segments[0]
+        elif segments[:1] == ['watch']:
+            video_id = parse_qs(parts.query).get('v', [None])[0]
+        elif len(segments) >= 2 and segments[0] in ('shorts', 'embed', 'live', 'v'):
+            video_id = segments[1]
+        if video_id and YOUTUBE_ID.match(video_id):
+            canonical = f"https://www.youtube.com/watch?v={video_id}"
+        else:
+            video_id = None
+
+    elif platform == 'tiktok':
+        match = TIKTOK_VIDEO_PATH.match(path)
+        if match:
+            user, kind, video_id = match.groups()
+            canonical = (f"https://www.tiktok.com/@{user}/{kind}/{video_id}" if user
+                         else f"https://www.tiktok.com/@/video/{video_id}")
+        elif host.startswith(('vm.', 'vt.')) or path.startswith('/t/'):
+            short = bool(TIKTOK_SHORT_PATH.match(path))
+
+    elif platform == 'instagram':
+        # /share/... tokens aren't shortcodes - check before INSTAGRAM_PATH
+        match = None if path.startswith('/share/') else INSTAGRAM_PATH.match(path)
+        if match:
+            kind, video_id = match.groups()
+            kind = 'reel' if kind.startswith('reel') else kind
+            canonical = f"https://www.instagram.com/{kind}/{video_id}/"
+        elif path.startswith('/share/'):
+            short = True
+
+    if short:
+        # Share links differ only in tracking params - drop them for the cache key
+        canonical = f"https://{host}{path}"
+
+    return {
+        'platform': platform,
+        'video_id': video_id,
+        'url': canonical,
+        'key': f"{platform}:{video_id}" if video_id else canonical,
+        'short': short,
+    }
+
+
+# ==================== Short Link Resolution ====================
+
+class TTLCache:
+    """Small LRU cache whose entries expire after ttl seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+
+    def get(self, key):
+        item = self.data.get(key)
+        if not item:
+            return None
+        value, expires = item
+        if expires < time.monotonic():
+            del self.data[key]
+            return None
+        self.data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self.data[key] = (value, time.monotonic() + self.ttl)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+
+resolved_urls = TTLCache(URL_CACHE_SIZE, URL_CACHE_TTL)
+
+
+async def resolve_short_url(url: str) -> str | None:
+    """Follow a share link's redirects to the real video URL."""
+    try:
+        async with aiohttp.ClientSession() as session:
+            headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+            async with session.get(url, headers=headers, allow_redirects=True, timeout=10) as response:
+                return str(response.url)
+    except Exception as e:
+        print(f"Short link error: {e}")
+    return None
+
+
+async def normalize_url(url: str) -> dict | None:
+    """Canonicalize a link, resolving short links once through the cache."""
+    link = parse_url(url)
+    if not link or not link['short']:
+        return link
+
+    cached = resolved_urls.get(link['url'])
+    if cached:
+        return cached
+
+    final_url = await resolve_short_url(link['url'])
+    resolved = parse_url(final_url) if final_url else None
+    if resolved and resolved['video_id']:
+        resolved_urls.set(link['url'], resolved)
+        return resolved
+
+    # Resolution failed - the downloaders can still follow the redirect themselves
+    return link
+
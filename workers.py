@@ -0,0 +1,234 @@
+import os
+import sys
+import time
+import uuid
+import queue
+import shutil
+import socket
+import threading
+import subprocess
+from multiprocessing.connection import Connection
+from config import YTDLP_WORKERS, YTDLP_MAX_JOBS_PER_WORKER, YTDLP_MAX_WORKER_RSS_MB, YTDLP_JOB_TIMEOUT, TEMP_DIR
+from tracing import span
+
+
+def worker_main(conn):
+    """Child process loop: run yt-dlp jobs until told to stop."""
+    from downloader import run_ytdlp
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        try:
+            result = run_ytdlp(*job)
+        except Exception as e:
+            print(f"Worker error: {e}")
+            result = None
+        conn.send(result)
+
+
+def get_rss_mb(pid: int) -> float | None:
+    """Resident memory of a process in MB (Linux only)."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+# ==================== Worker ====================
+
+class YtdlpWorker:
+    """One child process that runs yt-dlp jobs one at a time.
+
+    Started as `python workers.py <fd>` rather than through multiprocessing:
+    spawn/forkserver children re-import the main module (bot.py), which would
+    load python-telegram-bot into every worker. This way a worker only
+    imports downloader and its dependencies.
+    """
+
+    def __init__(self):
+        parent_sock, child_sock = socket.socketpair()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), str(child_sock.fileno())],
+            pass_fds=(child_sock.fileno(),),
+        )
+        child_sock.close()
+        self.conn = Connection(parent_sock.detach())
+        self.jobs = 0
+
+    def run(self, job: tuple, timeout: float):
+        """Send a job and wait for its result. Raises TimeoutError or EOFError."""
+        self.jobs += 1
+        self.conn.send(job)
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"yt-dlp job took longer than {timeout}s")
+        return self.conn.recv()
+
+    def rss_mb(self) -> float | None:
+        return get_rss_mb(self.process.pid)
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def is_worn_out(self) -> bool:
+        if not self.is_alive() or self.jobs >= YTDLP_MAX_JOBS_PER_WORKER:
+            return True
+        rss = self.rss_mb()
+        return rss is not None and rss > YTDLP_MAX_WORKER_RSS_MB
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        self.kill()
+
+    def kill(self):
+        if self.is_alive():
+            self.process.kill()
+            self.process.wait(timeout=5)
+        self.conn.close()
+
+
+# ==================== Pool ====================
+
+class YtdlpPool:
+    """Fixed-size pool of recycled yt-dlp worker processes.
+
+    Callers (executor threads) block until a worker is free. A worker is
+    replaced after YTDLP_MAX_JOBS_PER_WORKER jobs, when its RSS grows past
+    YTDLP_MAX_WORKER_RSS_MB, or killed outright when a job times out.
+    """
+
+    def __init__(self, size: int = YTDLP_WORKERS, timeout: float = YTDLP_JOB_TIMEOUT):
+        self.timeout = timeout
+        self.idle = queue.Queue()
+        self.workers = set()
+        self.lock = threading.Lock()
+        self.stats = {'jobs': 0, 'timeouts': 0, 'crashes': 0, 'recycled': 0}
+        for _ in range(size):
+            self.idle.put(None)  # started lazily on first use
+
+    def run(self, url: str, user_cookies_path: str = None, audio_only: bool = False) -> dict | None:
+        with span('ytdlp_worker') as attrs:
+            return self.run_job(url, user_cookies_path, audio_only, attrs)
+
+    def run_job(self, url: str, user_cookies_path: str, audio_only: bool, attrs: dict) -> dict | None:
+        waited = time.perf_counter()
+        worker = self.idle.get()
+        attrs['queue_ms'] = round((time.perf_counter() - waited) * 1000, 1)
+        if worker is None:
+            try:
+                worker = self.spawn()
+            except Exception:
+                self.idle.put(None)
+                raise
+        attrs['pid'] = worker.process.pid
+        # Each job downloads into its own directory so a killed job's .part
+        # and fragment files can be removed with it
+        job_dir = os.path.join(TEMP_DIR, f"job-{uuid.uuid4().hex[:12]}")
+        try:
+            result = worker.run((url, user_cookies_path, audio_only, job_dir), self.timeout)
+        except TimeoutError:
+            print(f"yt-dlp worker {worker.process.pid} timed out on {url} - killing it")
+            self.stats['timeouts'] += 1
+            self.retire(worker, kill=True)
+            shutil.rmtree(job_dir, ignore_errors=True)
+            return {'error': 'التحميل أخد وقت طويل جداً - جرب تاني'}
+        except (EOFError, OSError) as e:
+            print(f"yt-dlp worker {worker.process.pid} died: {e}")
+            self.stats['crashes'] += 1
+            self.retire(worker, kill=True)
+            shutil.rmtree(job_dir, ignore_errors=True)
+            return None
+
+        try:
+            result = collect_job_file(result, job_dir)
+        except Exception as e:
+            # Never lose the slot - a pool without free workers hangs every request
+            print(f"Could not collect yt-dlp output for {url}: {e}")
+            self.retire(worker)
+            shutil.rmtree(job_dir, ignore_errors=True)
+            return None
+
+        self.stats['jobs'] += 1
+        attrs['rss_mb'] = worker.rss_mb()
+        print(f"yt-dlp worker {worker.process.pid}: job {worker.jobs}, RSS {attrs['rss_mb']}MB")
+        if worker.is_worn_out():
+            self.stats['recycled'] += 1
+            self.retire(worker)
+        else:
+            self.idle.put(worker)
+        return result
+
+    def spawn(self) -> YtdlpWorker:
+        worker = YtdlpWorker()
+        with self.lock:
+            self.workers.add(worker)
+        return worker
+
+    def retire(self, worker: YtdlpWorker, kill: bool = False):
+        """Stop a worker and free its slot (the replacement starts lazily)."""
+        with self.lock:
+            self.workers.discard(worker)
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+        self.idle.put(None)
+
+    def report(self) -> dict:
+        """Per-worker job counts and memory, plus pool counters."""
+        with self.lock:
+            workers = list(self.workers)
+        return {
+            **self.stats,
+            'workers': [
+                {'pid': w.process.pid, 'jobs': w.jobs, 'rss_mb': w.rss_mb()}
+                for w in workers
+            ],
+        }
+
+
+def collect_job_file(result: dict | None, job_dir: str) -> dict | None:
+    """Move the finished file out of the job directory, then remove the rest.
+
+    The file keeps the job directory's name as a prefix: two requests for the
+    same video must not share (and clean up) each other's files.
+    """
+    if result and result.get('file_path'):
+        file_name = f"{os.path.basename(job_dir)}-{os.path.basename(result['file_path'])}"
+        file_path = os.path.join(TEMP_DIR, file_name)
+        os.replace(result['file_path'], file_path)
+        result['file_path'] = file_path
+    shutil.rmtree(job_dir, ignore_errors=True)
+    return result
+
+
+ytdlp_pool = None
+ytdlp_pool_lock = threading.Lock()
+
+
+def get_ytdlp_pool() -> YtdlpPool:
+    """Create the pool on first use (never inside the worker processes)."""
+    global ytdlp_pool
+    with ytdlp_pool_lock:
+        if ytdlp_pool is None:
+            ytdlp_pool = YtdlpPool()
+        return ytdlp_pool
+
+
+if __name__ == '__main__':
+    # Worker process entry: argv[1] is the socket fd shared with the pool
+    worker_main(Connection(int(sys.argv[1])))